@@ -5,6 +5,7 @@ UAS Business Intelligence 2025
 """
 
 import os
+import functools
 import logging
 from dotenv import load_dotenv # Import wajib untuk membaca .env
 from sqlalchemy import create_engine, text
@@ -14,11 +15,8 @@ import psycopg2
 load_dotenv()
 
 # ✅ MATIKAN SQLALCHEMY LOGGING (Sesuai request Anda)
+# (cukup di logger induk: sqlalchemy.engine/.pool/.dialects/.orm mewarisi level ini)
 logging.getLogger('sqlalchemy').setLevel(logging.ERROR)
-logging.getLogger('sqlalchemy.engine').setLevel(logging.ERROR)
-logging.getLogger('sqlalchemy.pool').setLevel(logging.ERROR)
-logging.getLogger('sqlalchemy.dialects').setLevel(logging.ERROR)
-logging.getLogger('sqlalchemy.orm').setLevel(logging.ERROR)
 
 # 2. Database Configuration (DINAMIS - Bisa baca dari Docker atau .env)
 # Jika dijalankan via Docker, dia akan ambil 'DB_HOST' dari docker-compose (host.docker.internal)
@@ -38,8 +36,52 @@ DATABASE_URL = os.getenv(
     f"postgresql://{DB_CONFIG['user']}:{DB_CONFIG['password']}@{DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['database']}"
 )
 
+# Batas bind parameter PostgreSQL per statement adalah 32767 (disisakan margin)
+PG_MAX_PARAMS = 32000
+
+
+def get_insert_chunksize(n_columns, max_rows=10000):
+    """Chunk size multi-row INSERT agar rows x kolom tetap di bawah batas parameter"""
+    return max(1, min(max_rows, PG_MAX_PARAMS // max(1, n_columns)))
+
+
+# Row count estimasi dari statistik planner (pg_class.reltuples), dibatasi ke
+# schema aktif agar tabel bernama sama di schema lain tidak ikut terbaca.
+# reltuples = -1 untuk tabel yang belum pernah di-ANALYZE/VACUUM → NULL
+ESTIMATED_ROW_COUNT_QUERY = text("""
+SELECT c.relname AS table_name,
+       CASE WHEN c.reltuples < 0 THEN NULL ELSE c.reltuples::BIGINT END AS row_count
+FROM pg_class c
+JOIN pg_namespace n ON n.oid = c.relnamespace
+WHERE c.relkind = 'r'
+AND n.nspname = current_schema()
+AND c.relname = ANY(:table_names)
+ORDER BY c.relname;
+""")
+
+
+def fetch_estimated_row_counts(conn, table_names):
+    """
+    Row count per tabel dari pg_class.reltuples (tanpa full scan COUNT(*))
+    Return list (table_name, row_count); row_count None = belum pernah di-ANALYZE
+    Tabel yang tidak ada di schema aktif → RuntimeError (seperti COUNT(*) dulu),
+    bukan hilang diam-diam dari hasil
+    """
+    rows = conn.execute(ESTIMATED_ROW_COUNT_QUERY, {'table_names': list(table_names)}).fetchall()
+    
+    missing_tables = sorted(set(table_names) - {row[0] for row in rows})
+    if missing_tables:
+        raise RuntimeError(f"Table(s) not found in current schema: {', '.join(missing_tables)}")
+    
+    return rows
+
+
+@functools.lru_cache(maxsize=None)
 def get_engine():
-    """Get SQLAlchemy engine WITHOUT any logging"""
+    """
+    Get SQLAlchemy engine WITHOUT any logging
+    Engine di-cache (singleton) agar connection pool dipakai ulang antar pemanggil
+    """
     # ✅ Force disable engine logging
     engine_logger = logging.getLogger('sqlalchemy.engine.base.Engine')
     engine_logger.handlers = [logging.NullHandler()]
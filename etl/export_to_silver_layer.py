@@ -11,6 +11,12 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# Kolom turunan (generated column) di staging yang hanya untuk JOIN/load DW,
+# tidak ikut ke parquet Silver agar schema lake tetap sama dengan sumbernya
+SILVER_EXCLUDED_COLUMNS = {
+    'staging_marketing': ['dt_customer_date', 'total_spending_calc'],
+}
+
 def export_to_silver():
     """Export cleaned staging data to Parquet in Silver layer"""
     
@@ -40,6 +46,7 @@ def export_to_silver():
         logger.info("  → cleaned_marketing.parquet")
         with engine.connect() as conn:
             df = pd.read_sql(text("SELECT * FROM staging_marketing"), conn)
+        df = df.drop(columns=SILVER_EXCLUDED_COLUMNS['staging_marketing'], errors='ignore')
         df.to_parquet(silver_path / 'cleaned_marketing.parquet', 
                       compression='snappy', index=False)
         logger.info(f"     Exported {len(df)} rows")
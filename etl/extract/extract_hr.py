@@ -12,7 +12,7 @@ from sqlalchemy import text
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
-from config.database_config import get_engine
+from config.database_config import get_engine, get_insert_chunksize
 from config.etl_config import PATHS, CSV_FILES
 
 # ✅ MATIKAN SQLALCHEMY LOGGING
@@ -35,7 +35,7 @@ def extract_hr_data():
             delimiter=';',  # ✅ HR uses semicolon
             encoding='utf-8',
             on_bad_lines='skip',  # ✅ Skip malformed lines
-            engine='python',  # ✅ More flexible
+            engine='c',  # ✅ Parser C (cepat); on_bad_lines/skipinitialspace/quotechar tetap didukung
             skipinitialspace=True,  # ✅ Remove leading spaces
             quotechar='"'  # ✅ Handle quoted fields
         )
@@ -87,38 +87,38 @@ def extract_hr_data():
         raise
 
 
-def load_to_staging_db(df):
-    """Load HR data to staging_hr table - ROW BY ROW"""
+def load_to_staging_db(df, conn=None):
+    """
+    Load HR data to staging_hr table (multi-row INSERT per chunk)
+    conn: koneksi dengan transaksi aktif (opsional); jika None, buka satu transaksi sendiri
+    """
+    if conn is None:
+        with get_engine().begin() as conn:
+            return load_to_staging_db(df, conn=conn)
+    
     try:
         logger.info("Loading HR data to staging_hr table...")
         logger.info(f"   Records to load: {len(df)}")
         
-        engine = get_engine()
-        
-        # Truncate staging table
+        # Truncate staging table (dalam transaksi yang sama dengan INSERT)
         logger.info("   Truncating staging_hr table...")
-        with engine.connect() as conn:
-            conn.execute(text("TRUNCATE TABLE staging_hr RESTART IDENTITY CASCADE"))
-            conn.commit()
+        conn.execute(text("TRUNCATE TABLE staging_hr RESTART IDENTITY CASCADE"))
         
-        # ✅ LOAD ROW BY ROW (SLOWEST BUT SAFEST)
-        logger.info(f"   Loading rows individually...")
+        # ✅ LOAD DALAM CHUNK (multi-row INSERT, ukuran chunk disesuaikan jumlah kolom)
+        chunk_size = get_insert_chunksize(len(df.columns))
+        logger.info(f"   Loading data in chunks of {chunk_size} rows...")
         
-        for i, row in df.iterrows():
-            row_df = pd.DataFrame([row])
-            row_df.to_sql('staging_hr', engine, if_exists='append', index=False, method='multi')
-            
-            # Print progress every 50 rows
-            if (i + 1) % 50 == 0 or (i + 1) == len(df):
-                logger.info(f"   Progress: {i + 1}/{len(df)} rows loaded")
+        df.to_sql(
+            'staging_hr', conn, if_exists='append', index=False,
+            method='multi', chunksize=chunk_size
+        )
         
         logger.info(f"[OK] Successfully loaded {len(df)} rows")
         
         # Verify
-        with engine.connect() as conn:
-            result = conn.execute(text("SELECT COUNT(*) FROM staging_hr"))
-            row_count = result.scalar()
-            logger.info(f"[OK] Verified row count: {row_count}")
+        result = conn.execute(text("SELECT COUNT(*) FROM staging_hr"))
+        row_count = result.scalar()
+        logger.info(f"[OK] Verified row count: {row_count}")
         
     except Exception as e:
         logger.error(f"[ERROR] Error loading HR data: {e}")
@@ -12,7 +12,7 @@ from sqlalchemy import text
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
-from config.database_config import get_engine
+from config.database_config import get_engine, get_insert_chunksize
 from config.etl_config import PATHS, CSV_FILES
 
 # ✅ MATIKAN SQLALCHEMY LOGGING
@@ -41,7 +41,7 @@ def extract_marketing_data():
                     delimiter=delimiter,
                     encoding='utf-8',
                     on_bad_lines='skip',
-                    engine='python',
+                    engine='c',  # ✅ Parser C (cepat), delimiter 1 karakter
                     skipinitialspace=True
                 )
                 
@@ -107,31 +107,56 @@ def extract_marketing_data():
         raise
 
 
-def load_to_staging_db(df):
-    """Load marketing data to staging_marketing table"""
+def load_to_staging_db(df, conn=None):
+    """
+    Load marketing data to staging_marketing table
+    conn: koneksi dengan transaksi aktif (opsional); jika None, buka satu transaksi sendiri
+    (DDL PostgreSQL transaksional → DROP, CREATE, INSERT, ALTER di-commit sekali)
+    """
+    if conn is None:
+        with get_engine().begin() as conn:
+            return load_to_staging_db(df, conn=conn)
+    
     try:
         logger.info("Loading marketing data to staging_marketing table...")
         logger.info(f"   Records to load: {len(df)}")
         
-        engine = get_engine()
-        
         # ✅ DROP AND RECREATE TABLE
         logger.info("   Dropping and recreating staging_marketing table...")
-        with engine.connect() as conn:
-            conn.execute(text("DROP TABLE IF EXISTS staging_marketing CASCADE"))
-            conn.commit()
+        conn.execute(text("DROP TABLE IF EXISTS staging_marketing CASCADE"))
         
         # ✅ LOAD DATA WITH AUTO-SCHEMA
         logger.info(f"   Loading data with auto-schema detection...")
-        df.to_sql('staging_marketing', engine, if_exists='replace', index=False, method='multi', chunksize=100)
+        df.to_sql(
+            'staging_marketing', conn, if_exists='replace', index=False,
+            method='multi', chunksize=get_insert_chunksize(len(df.columns))
+        )
         
         logger.info(f"[OK] Successfully loaded {len(df)} rows")
         
+        # ✅ Kolom turunan sebagai generated column (dihitung sekali saat load):
+        # - dt_customer_date: JOIN ke dim_tanggal pakai DATE native (+ index)
+        # - total_spending_calc: total 6 kategori belanja
+        conn.execute(text("""
+            ALTER TABLE staging_marketing
+            ADD COLUMN dt_customer_date DATE
+                GENERATED ALWAYS AS (dt_customer::DATE) STORED,
+            ADD COLUMN total_spending_calc NUMERIC
+                GENERATED ALWAYS AS (
+                    COALESCE(mntwines, 0) + COALESCE(mntfruits, 0) +
+                    COALESCE(mntmeatproducts, 0) + COALESCE(mntfishproducts, 0) +
+                    COALESCE(mntsweetproducts, 0) + COALESCE(mntgoldprods, 0)
+                ) STORED
+        """))
+        conn.execute(text(
+            "CREATE INDEX idx_staging_marketing_dt_customer_date "
+            "ON staging_marketing (dt_customer_date)"
+        ))
+        
         # Verify
-        with engine.connect() as conn:
-            result = conn.execute(text("SELECT COUNT(*) FROM staging_marketing"))
-            row_count = result.scalar()
-            logger.info(f"[OK] Verified row count: {row_count}")
+        result = conn.execute(text("SELECT COUNT(*) FROM staging_marketing"))
+        row_count = result.scalar()
+        logger.info(f"[OK] Verified row count: {row_count}")
         
     except Exception as e:
         logger.error(f"[ERROR] Error loading marketing data: {e}")
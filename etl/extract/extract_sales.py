@@ -13,7 +13,7 @@ from sqlalchemy import text
 # Add parent directory to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
-from config.database_config import get_engine
+from config.database_config import get_engine, get_insert_chunksize
 from config.etl_config import PATHS, CSV_FILES
 from etl.transform.transform_sales import transform_sales_data
 
@@ -71,22 +71,23 @@ def extract_sales_data():
         raise
 
 
-def load_to_staging_db(df):
+def load_to_staging_db(df, conn=None):
     """
     Load extracted and transformed data to staging_sales table
+    conn: koneksi dengan transaksi aktif (opsional); jika None, buka satu
+    transaksi sendiri → TRUNCATE + semua chunk INSERT di-commit sekali
     """
+    if conn is None:
+        with get_engine().begin() as conn:
+            return load_to_staging_db(df, conn=conn)
+    
     try:
         logger.info("\nLoading sales data to staging_sales table...")
         logger.info(f"   Records to load: {len(df)}")
         
-        # Get database engine
-        engine = get_engine()
-        
-        # ✅ TRUNCATE staging table first
+        # ✅ TRUNCATE staging table first (dalam transaksi yang sama dengan INSERT)
         logger.info("   Truncating staging_sales table...")
-        with engine.connect() as conn:
-            conn.execute(text("TRUNCATE TABLE staging_sales RESTART IDENTITY CASCADE"))
-            conn.commit()
+        conn.execute(text("TRUNCATE TABLE staging_sales RESTART IDENTITY CASCADE"))
         
         # ✅ PENTING: Hapus duplikat kolom SEBELUM load
         logger.info(f"   Original shape: {df.shape}")
@@ -115,8 +116,8 @@ def load_to_staging_db(df):
         if missing_cols:
             logger.warning(f"   Missing columns: {missing_cols}")
         
-        # ✅ Load data in smaller chunks
-        chunk_size = 100
+        # ✅ Load data in chunks (ukuran chunk disesuaikan jumlah kolom)
+        chunk_size = get_insert_chunksize(len(df_clean.columns))
         total_chunks = (len(df_clean) - 1) // chunk_size + 1
         
         logger.info(f"   Loading data in {total_chunks} chunks of {chunk_size} rows...")
@@ -135,7 +136,7 @@ def load_to_staging_db(df):
                 
                 chunk.to_sql(
                     'staging_sales', 
-                    engine, 
+                    conn, 
                     if_exists='append', 
                     index=False, 
                     method='multi'
@@ -155,22 +156,21 @@ def load_to_staging_db(df):
         logger.info(f"[OK] Successfully loaded {loaded_rows} rows to staging_sales")
         
         # ✅ Verify row count in database
-        with engine.connect() as conn:
-            result = conn.execute(text("SELECT COUNT(*) FROM staging_sales"))
-            row_count = result.scalar()
-            logger.info(f"[OK] Verified staging_sales row count: {row_count}")
-            
-            # ✅ Show sample data
-            result = conn.execute(text("""
-                SELECT 
-                    COUNT(*) as total_rows,
-                    AVG(total_penjualan_sebelum_pajak) as avg_sales,
-                    MIN(total_penjualan_sebelum_pajak) as min_sales,
-                    MAX(total_penjualan_sebelum_pajak) as max_sales
-                FROM staging_sales
-            """))
-            stats = result.fetchone()
-            logger.info(f"[OK] Stats: Rows={stats[0]}, Avg=Rp {stats[1]:,.0f}, Min=Rp {stats[2]:,.0f}, Max=Rp {stats[3]:,.0f}")
+        result = conn.execute(text("SELECT COUNT(*) FROM staging_sales"))
+        row_count = result.scalar()
+        logger.info(f"[OK] Verified staging_sales row count: {row_count}")
+        
+        # ✅ Show sample data
+        result = conn.execute(text("""
+            SELECT 
+                COUNT(*) as total_rows,
+                AVG(total_penjualan_sebelum_pajak) as avg_sales,
+                MIN(total_penjualan_sebelum_pajak) as min_sales,
+                MAX(total_penjualan_sebelum_pajak) as max_sales
+            FROM staging_sales
+        """))
+        stats = result.fetchone()
+        logger.info(f"[OK] Stats: Rows={stats[0]}, Avg=Rp {stats[1]:,.0f}, Min=Rp {stats[2]:,.0f}, Max=Rp {stats[3]:,.0f}")
         
     except Exception as e:
         logger.error(f"[ERROR] Error loading to staging: {e}")
@@ -8,71 +8,57 @@ This script loads data from staging tables to dimension tables:
 - dim_employee (from staging_hr)
 """
 
-import pandas as pd
 import logging
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 import sys
 import os
 from sqlalchemy import text  # ✅ ADD THIS
-import traceback
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
-from config.database_config import get_engine, get_connection
+from config.database_config import get_engine, fetch_estimated_row_counts
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+DIMENSION_TABLES = [
+    'dim_produk', 'dim_customer', 'dim_employee', 'dim_cabang',
+    'dim_payment', 'dim_kampanye', 'dim_tanggal'
+]
+
 
 def load_dim_produk():
     """
     Load unique products to dim_produk
-    Extract distinct products from staging_sales
+    Extract distinct products from staging_sales (server-side INSERT ... SELECT)
     """
     try:
         logger.info("Loading dim_produk...")
         
         engine = get_engine()
         
-        # ✅ Get unique products from staging dengan text() wrapper
+        # ✅ Satu statement: DISTINCT + insert produk baru, tanpa loop di Python
         query = text("""
-        SELECT DISTINCT 
-            kategori_produk,
+        INSERT INTO dim_produk (kategori_produk, created_date, updated_date)
+        SELECT DISTINCT
+            ss.kategori_produk,
             NOW() as created_date,
             NOW() as updated_date
-        FROM staging_sales
-        WHERE kategori_produk IS NOT NULL
-        AND kategori_produk != ''
+        FROM staging_sales ss
+        WHERE ss.kategori_produk IS NOT NULL
+        AND ss.kategori_produk != ''
+        AND NOT EXISTS (
+            SELECT 1 FROM dim_produk dp
+            WHERE dp.kategori_produk = ss.kategori_produk
+        )
+        ON CONFLICT DO NOTHING
         """)
         
-        with engine.connect() as conn:
-            df = pd.read_sql(query, conn)
-        
-        if len(df) == 0:
-            logger.warning("No products found in staging_sales")
-            return
-        
-        # Use helper function to insert products
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        inserted_count = 0
-        for _, row in df.iterrows():
-            try:
-                cursor.execute(
-                    "SELECT get_or_create_produk_key(%s)",
-                    (row['kategori_produk'],)
-                )
-                inserted_count += 1
-            except Exception as e:
-                logger.warning(f"Error inserting product '{row['kategori_produk']}': {e}")
-                continue
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
+        with engine.begin() as conn:
+            row_count = conn.execute(query).rowcount
         
-        logger.info(f"[OK] Loaded {inserted_count} products to dim_produk")
+        logger.info(f"[OK] Loaded {row_count} new products to dim_produk")
         
     except Exception as e:
         logger.error(f"[ERROR] Error loading dim_produk: {e}")
@@ -86,59 +72,49 @@ def load_dim_customer():
         
         engine = get_engine()
         
-        with engine.connect() as conn:
-            # ✅ TRUNCATE TABLE BEFORE LOAD (Clear old data)
+        # ✅ TRUNCATE + INSERT ... SELECT dalam satu transaksi (data tidak lewat Python)
+        query = text("""
+        INSERT INTO dim_customer (
+            customer_id, year_birth, age, education, marital_status,
+            income, kidhome, teenhome, dt_customer, customer_segment,
+            total_spending, is_active, created_date, updated_date
+        )
+        SELECT DISTINCT
+            id as customer_id,
+            year_birth,
+            EXTRACT(YEAR FROM CURRENT_DATE) - year_birth as age,
+            education,
+            marital_status,
+            income,
+            kidhome,
+            teenhome,
+            dt_customer,
+            CASE
+                WHEN income > 75000 THEN 'VIP'
+                WHEN income > 50000 THEN 'Premium'
+                ELSE 'Regular'
+            END as customer_segment,
+            total_spending_calc as total_spending,
+            TRUE as is_active,
+            NOW() as created_date,
+            NOW() as updated_date
+        FROM staging_marketing
+        WHERE id IS NOT NULL
+        """)
+        
+        with engine.begin() as conn:
             conn.execute(text("TRUNCATE TABLE dim_customer RESTART IDENTITY CASCADE"))
-            conn.commit()
             logger.info("   Truncated dim_customer table")
             
-            query = text("""
-            SELECT DISTINCT
-                id as customer_id,
-                year_birth,
-                EXTRACT(YEAR FROM CURRENT_DATE) - year_birth as age,
-                education,
-                marital_status,
-                income,
-                kidhome,
-                teenhome,
-                dt_customer,
-                CASE
-                    WHEN income > 75000 THEN 'VIP'
-                    WHEN income > 50000 THEN 'Premium'
-                    ELSE 'Regular'
-                END as customer_segment,
-                (COALESCE(mntwines, 0) + COALESCE(mntfruits, 0) +
-                 COALESCE(mntmeatproducts, 0) + COALESCE(mntfishproducts, 0) +
-                 COALESCE(mntsweetproducts, 0) + COALESCE(mntgoldprods, 0)) as total_spending,
-                TRUE as is_active,
-                NOW() as created_date,
-                NOW() as updated_date
-            FROM staging_marketing
-            WHERE id IS NOT NULL
-            """)
-            
-            df = pd.read_sql(query, conn)
-            
-            if len(df) > 0:
-                # ✅ Load in chunks (50 rows per chunk)
-                chunk_size = 50
-                total_loaded = 0
-                
-                for i in range(0, len(df), chunk_size):
-                    chunk = df.iloc[i:i+chunk_size]
-                    chunk.to_sql('dim_customer', conn, if_exists='append', index=False, method='multi')
-                    total_loaded += len(chunk)
-                    logger.info(f"   Loaded chunk {i//chunk_size + 1}: {len(chunk)} rows (Total: {total_loaded}/{len(df)})")
-                
-                conn.commit()
-                logger.info(f"[OK] Successfully loaded {len(df)} customers to dim_customer")
-            else:
-                logger.warning("No customer data to load")
+            row_count = conn.execute(query).rowcount
+        
+        if row_count > 0:
+            logger.info(f"[OK] Successfully loaded {row_count} customers to dim_customer")
+        else:
+            logger.warning("No customer data to load")
                 
-    except Exception as e:
-        logger.error(f"[ERROR] Error loading dim_customer: {e}")
-        logger.error(traceback.format_exc())
+    except Exception:
+        logger.exception("[ERROR] Error loading dim_customer")
         raise
 
 def load_dim_employee():
@@ -147,57 +123,51 @@ def load_dim_employee():
         logger.info("Loading dim_employee...")
         engine = get_engine()
         
-        with engine.connect() as conn:
-            # TRUNCATE
+        # ✅ TRUNCATE + INSERT ... SELECT dalam satu transaksi
+        # (managerid sudah INTEGER setelah ALTER TABLE di pgAdmin)
+        query = text("""
+        INSERT INTO dim_employee (
+            emp_id, employee_name, position, department, manager_name,
+            manager_id, sex, marital_desc, dob, age, date_of_hire,
+            employment_status, salary, is_active, created_date, updated_date
+        )
+        SELECT DISTINCT
+            empid as emp_id,
+            employee_name,
+            position,
+            department,
+            managername as manager_name,
+            managerid as manager_id,
+            sex,
+            maritaldesc as marital_desc,
+            CASE WHEN dob IS NULL OR TRIM(dob) = '' THEN NULL ELSE dob::DATE END as dob,
+            CASE 
+                WHEN dob IS NULL OR TRIM(dob) = '' THEN 0
+                ELSE EXTRACT(YEAR FROM age(dob::DATE))
+            END as age,
+            dateofhire::DATE as date_of_hire,
+            employmentstatus as employment_status,
+            salary,
+            CASE WHEN employmentstatus = 'Active' THEN TRUE ELSE FALSE END as is_active,
+            NOW() as created_date,
+            NOW() as updated_date
+        FROM staging_hr
+        WHERE empid IS NOT NULL
+        """)
+        
+        with engine.begin() as conn:
             conn.execute(text("TRUNCATE TABLE dim_employee RESTART IDENTITY CASCADE"))
-            conn.commit()
             logger.info("   Truncated dim_employee table")
             
-            # GET DATA (managerid sudah INTEGER setelah ALTER TABLE di pgAdmin)
-            query = text("""
-            SELECT DISTINCT
-                empid as emp_id,
-                employee_name,
-                position,
-                department,
-                managername as manager_name,
-                managerid as manager_id,
-                sex,
-                maritaldesc as marital_desc,
-                CASE WHEN dob IS NULL OR TRIM(dob) = '' THEN NULL ELSE dob::DATE END as dob,
-                CASE 
-                    WHEN dob IS NULL OR TRIM(dob) = '' THEN 0
-                    ELSE EXTRACT(YEAR FROM age(dob::DATE))
-                END as age,
-                dateofhire::DATE as date_of_hire,
-                employmentstatus as employment_status,
-                salary,
-                CASE WHEN employmentstatus = 'Active' THEN TRUE ELSE FALSE END as is_active
-            FROM staging_hr
-            WHERE empid IS NOT NULL
-            """)
-            
-            df = pd.read_sql(query, conn)
-            
-            if len(df) > 0:
-                df['created_date'] = datetime.now()
-                df['updated_date'] = datetime.now()
-                
-                # Batch insert dengan chunk kecil
-                chunk_size = 25
-                for i in range(0, len(df), chunk_size):
-                    chunk = df.iloc[i:i+chunk_size]
-                    chunk.to_sql('dim_employee', conn, if_exists='append', index=False, method='multi')
-                    logger.info(f"   Loaded {min(i+chunk_size, len(df))}/{len(df)} employees...")
-                
-                conn.commit()
-                logger.info(f"[OK] Successfully loaded {len(df)} employees to dim_employee")
-            else:
-                logger.warning("No employee data to load")
+            row_count = conn.execute(query).rowcount
+        
+        if row_count > 0:
+            logger.info(f"[OK] Successfully loaded {row_count} employees to dim_employee")
+        else:
+            logger.warning("No employee data to load")
                 
-    except Exception as e:
-        logger.error(f"[ERROR] Error loading dim_employee: {e}")
-        logger.error(traceback.format_exc())
+    except Exception:
+        logger.exception("[ERROR] Error loading dim_employee")
         raise
 
 def verify_dimensions():
@@ -209,34 +179,23 @@ def verify_dimensions():
         
         engine = get_engine()
         
-        # ✅ Verification query dengan text() wrapper
-        verification_query = text("""
-        SELECT 'dim_produk' as table_name, COUNT(*) as row_count FROM dim_produk
-        UNION ALL
-        SELECT 'dim_customer', COUNT(*) FROM dim_customer
-        UNION ALL
-        SELECT 'dim_employee', COUNT(*) FROM dim_employee
-        UNION ALL
-        SELECT 'dim_cabang', COUNT(*) FROM dim_cabang
-        UNION ALL
-        SELECT 'dim_payment', COUNT(*) FROM dim_payment
-        UNION ALL
-        SELECT 'dim_kampanye', COUNT(*) FROM dim_kampanye
-        UNION ALL
-        SELECT 'dim_tanggal', COUNT(*) FROM dim_tanggal
-        ORDER BY table_name;
-        """)
+        # ✅ Row count dari statistik planner (pg_class.reltuples) setelah
+        # ANALYZE — sampling, bukan full scan COUNT(*) per tabel
+        analyze_query = text(f"ANALYZE {', '.join(DIMENSION_TABLES)}")
         
-        with engine.connect() as conn:
-            df = pd.read_sql(verification_query, conn)
+        with engine.begin() as conn:
+            conn.execute(analyze_query)
+            rows = fetch_estimated_row_counts(conn, DIMENSION_TABLES)
         
         print("\n" + "=" * 50)
         print("DIMENSION TABLES ROW COUNTS:")
         print("=" * 50)
-        print(df.to_string(index=False))
+        print(f"{'table_name':<20} {'row_count':>10}")
+        for table_name, row_count in rows:
+            print(f"{table_name:<20} {'n/a' if row_count is None else row_count:>10}")
         print("=" * 50)
         
-        return df
+        return rows
         
     except Exception as e:
         logger.error(f"[ERROR] Error verifying dimensions: {e}")
@@ -254,10 +213,15 @@ def load_all_dimensions():
     start_time = datetime.now()
     
     try:
-        # Load dimensions
-        load_dim_produk()
-        load_dim_customer()
-        load_dim_employee()
+        # ✅ Load dimensions secara paralel (tabel target saling lepas,
+        # masing-masing worker memakai koneksi sendiri)
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            futures = [
+                executor.submit(loader)
+                for loader in (load_dim_produk, load_dim_customer, load_dim_employee)
+            ]
+            for future in futures:
+                future.result()
         
         # Verify results
         verify_dimensions()
@@ -272,12 +236,10 @@ def load_all_dimensions():
         
         return True
         
-    except Exception as e:
+    except Exception:
         logger.error("=" * 70)
-        logger.error(f"[ERROR] DIMENSION LOAD FAILED: {e}")
+        logger.exception("[ERROR] DIMENSION LOAD FAILED")
         logger.error("=" * 70)
-        import traceback
-        logger.error(traceback.format_exc())
         return False
 
 def load_dim_tanggal():
@@ -288,55 +250,44 @@ def load_dim_tanggal():
         engine = get_engine()
         
         with engine.connect() as conn:
-            # 1. Get min/max dates from ALL staging tables
-            query_dates = text("""
-            WITH all_dates AS (
-                SELECT CAST(dt_customer AS DATE) as tanggal FROM staging_marketing WHERE dt_customer IS NOT NULL
-                UNION
-                SELECT CAST(tanggal AS DATE) FROM staging_sales WHERE tanggal IS NOT NULL
-                UNION
-                SELECT CAST(dateofhire AS DATE) FROM staging_hr WHERE dateofhire IS NOT NULL
-                UNION
-                SELECT CAST(lastperformancereview_date AS DATE) FROM staging_hr WHERE lastperformancereview_date IS NOT NULL
-            )
-            SELECT 
-                MIN(tanggal) as min_date,
-                MAX(tanggal) as max_date
-            FROM all_dates
-            """)
-            
-            result = conn.execute(query_dates).fetchone()
-            
-            # Handle empty result
-            if result is None or result[0] is None:
-                min_date = '2020-01-01'
-                max_date = '2030-12-31'
-            else:
-                min_date = result[0]
-                max_date = result[1]
-            
-            logger.info(f"   Date range: {min_date} to {max_date}")
-            
-            # ✅ RECREATE TABLE (Hapus dan Buat Ulang dengan Struktur Benar)
-            # Ini memastikan kolom 'kuartal' pasti ada
-            logger.info("   Recreating dim_tanggal table schema...")
-            conn.execute(text("DROP TABLE IF EXISTS dim_tanggal CASCADE"))
+            # ✅ Buat tabel sekali saja (tanpa DROP ... CASCADE) agar FK dari
+            # fact tables dan surrogate key tanggal_key tetap stabil
             conn.execute(text("""
-                CREATE TABLE dim_tanggal (
+                CREATE TABLE IF NOT EXISTS dim_tanggal (
                     tanggal_key SERIAL PRIMARY KEY,
                     tanggal DATE UNIQUE,
                     hari INT,
                     bulan INT,
                     tahun INT,
-                    kuartal INT,  -- Kolom ini yang sebelumnya error (hilang)
+                    kuartal INT,
                     nama_hari VARCHAR(20),
                     nama_bulan VARCHAR(20)
                 )
             """))
+            # Pastikan kolom 'kuartal' ada pada tabel lama
+            conn.execute(text("ALTER TABLE dim_tanggal ADD COLUMN IF NOT EXISTS kuartal INT"))
             
-            # 3. Generate dates (Menggunakan CAST agar aman)
+            # ✅ Incremental: hanya tanggal baru yang di-insert (ON CONFLICT)
+            # min/max dari SEMUA staging tables dihitung langsung di server
+            # (fallback 2020-01-01 s/d 2030-12-31 jika staging kosong)
             query_generate = text("""
             INSERT INTO dim_tanggal (tanggal, hari, bulan, tahun, kuartal, nama_hari, nama_bulan)
+            WITH bounds AS (
+                -- MIN/MAX per tabel digabung dengan LEAST/GREATEST (tanpa UNION/dedup)
+                SELECT
+                    COALESCE(LEAST(
+                        (SELECT MIN(CAST(dt_customer AS DATE)) FROM staging_marketing),
+                        (SELECT MIN(CAST(tanggal AS DATE)) FROM staging_sales),
+                        (SELECT MIN(CAST(dateofhire AS DATE)) FROM staging_hr),
+                        (SELECT MIN(CAST(lastperformancereview_date AS DATE)) FROM staging_hr)
+                    ), DATE '2020-01-01') as min_date,
+                    COALESCE(GREATEST(
+                        (SELECT MAX(CAST(dt_customer AS DATE)) FROM staging_marketing),
+                        (SELECT MAX(CAST(tanggal AS DATE)) FROM staging_sales),
+                        (SELECT MAX(CAST(dateofhire AS DATE)) FROM staging_hr),
+                        (SELECT MAX(CAST(lastperformancereview_date AS DATE)) FROM staging_hr)
+                    ), DATE '2030-12-31') as max_date
+            )
             SELECT 
                 CAST(d AS DATE) as tanggal,
                 EXTRACT(DAY FROM d) as hari,
@@ -345,29 +296,22 @@ def load_dim_tanggal():
                 EXTRACT(QUARTER FROM d) as kuartal,
                 TO_CHAR(d, 'Day') as nama_hari,
                 TO_CHAR(d, 'Month') as nama_bulan
-            FROM generate_series(
-                CAST(:min_date AS DATE) - INTERVAL '1 year',
-                CAST(:max_date AS DATE) + INTERVAL '1 year',
+            FROM bounds,
+            generate_series(
+                bounds.min_date - INTERVAL '1 year',
+                bounds.max_date + INTERVAL '1 year',
                 '1 day'::INTERVAL
             ) d
             ON CONFLICT (tanggal) DO NOTHING;
             """)
             
-            conn.execute(query_generate, {
-                'min_date': min_date,
-                'max_date': max_date
-            })
+            row_count = conn.execute(query_generate).rowcount
             conn.commit()
             
-            # Verify count
-            verify_query = text("SELECT COUNT(*) FROM dim_tanggal")
-            row_count = conn.execute(verify_query).scalar()
-            
-            logger.info(f"[OK] Loaded {row_count} dates to dim_tanggal")
+            logger.info(f"[OK] Loaded {row_count} new dates to dim_tanggal")
             
-    except Exception as e:
-        logger.error(f"[ERROR] Error loading dim_tanggal: {e}")
-        logger.error(traceback.format_exc())
+    except Exception:
+        logger.exception("[ERROR] Error loading dim_tanggal")
         raise
 
 if __name__ == "__main__":
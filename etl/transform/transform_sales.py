@@ -24,24 +24,92 @@ logging.basicConfig(level=logging.INFO, format='%(message)s')
 logger = logging.getLogger(__name__)
 
 
+# Titik (pemisah ribuan) & spasi dihapus, koma (desimal) → titik
+NUMERIC_CLEAN_TABLE = str.maketrans({'.': None, ',': '.', ' ': None})
+
+
 def clean_numeric_column(series):
     """
     Bersihkan kolom numerik dari format Indonesia (titik pemisah ribuan)
     Contoh: '4.761.904.762' → 4761904762.0
     """
     if series.dtype == 'object':
-        # Hapus semua titik (pemisah ribuan)
-        series = series.astype(str).str.replace('.', '', regex=False)
-        # Ganti koma dengan titik (desimal)
-        series = series.str.replace(',', '.', regex=False)
-        # Hapus spasi dan karakter aneh
-        series = series.str.strip()
-        series = series.str.replace(' ', '', regex=False)
+        # ✅ Semua penggantian karakter dalam satu pass (str.translate),
+        # lalu hapus whitespace lain di ujung string
+        series = series.astype(str).str.translate(NUMERIC_CLEAN_TABLE).str.strip()
     
     # Convert ke numeric
     return pd.to_numeric(series, errors='coerce')
 
 
+# Kolom dengan sedikit nilai unik → disimpan sebagai category (kode int8 per baris)
+LOW_CARDINALITY_COLS = [
+    'cabang', 'kota', 'metode_pembayaran',
+    'tipe_customer', 'jenis_kelamin', 'kategori_produk'
+]
+
+
+def _recode_categories(categorical, new_values, missing=np.nan):
+    """
+    Ganti nilai tiap kategori dengan new_values (urutan = cat.categories)
+    Kategori yang jadi sama digabung; kode -1 (NaN) jadi missing
+    """
+    # Elemen terakhir untuk kode -1 (indeks negatif numpy)
+    new_codes, new_categories = pd.factorize(pd.Index(list(new_values) + [missing], dtype=object))
+    codes = new_codes[categorical.cat.codes.to_numpy()]
+    
+    return pd.Series(
+        pd.Categorical.from_codes(codes, categories=new_categories),
+        index=categorical.index, name=categorical.name
+    )
+
+
+def map_categories(series, mapping, default=None):
+    """
+    Terapkan mapping pada level kategori (O(#kategori), bukan O(#baris))
+    default=None → nilai di luar mapping tetap (seperti .replace)
+    default=X    → nilai di luar mapping & NaN jadi X (seperti .map().fillna(X))
+    """
+    categorical = series.astype('category')
+    new_values = [
+        mapping.get(c, c if default is None else default)
+        for c in categorical.cat.categories
+    ]
+    
+    return _recode_categories(
+        categorical, new_values,
+        missing=np.nan if default is None else default
+    )
+
+
+def clean_text_categories(series, title=False):
+    """
+    strip (dan title-case) dihitung sekali per nilai unik, bukan per baris
+    Hasil sama dengan series.astype(str).str.strip()[.str.title()]
+    """
+    categorical = series.astype(str).astype('category')
+    clean = (lambda c: c.strip().title()) if title else str.strip
+    
+    return _recode_categories(categorical, [clean(c) for c in categorical.cat.categories])
+
+
+def bin_categories(series, bins, labels, include_lowest=False):
+    """
+    Setara pd.cut(series, bins, labels, right=True) tanpa IntervalIndex:
+    nilai di (bins[i], bins[i+1]] → labels[i], di luar bins/NaN → NaN
+    """
+    values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+    bins = np.asarray(bins, dtype=np.float64)
+    
+    # side='left' → batas kanan inklusif, batas kiri eksklusif
+    codes = np.searchsorted(bins, values, side='left') - 1
+    if include_lowest:
+        codes[values == bins[0]] = 0
+    codes[codes >= len(labels)] = -1  # > bins[-1] atau NaN
+    
+    return pd.Categorical.from_codes(codes.astype(np.int8), categories=labels, ordered=True)
+
+
 def transform_sales_data(df):
     """
     Apply 40 transformation rules to sales data with USD to IDR conversion
@@ -87,18 +155,23 @@ def transform_sales_data(df):
         'pendapatan_kotor'
     ]
     
+    currency_cols = [col for col in currency_cols if col in df.columns]
+    original_samples = {col: (df[col].iloc[0] if len(df) > 0 else None) for col in currency_cols}
+    
     for col in numeric_cols:
         if col in df.columns:
-            original_sample = df[col].iloc[0] if len(df) > 0 else None
             df[col] = clean_numeric_column(df[col])
-            
-            # ✅ KONVERSI KE RUPIAH hanya jika masih USD
-            if col in currency_cols and USD_TO_IDR > 1:
-                df[col] = df[col] * USD_TO_IDR
-                cleaned_sample = df[col].iloc[0] if len(df) > 0 else None
-                logger.info(f"   {col}: {original_sample} → Rp {cleaned_sample:,.0f}")
-            elif col in currency_cols:
-                logger.info(f"   {col}: Already in IDR (Rp {df[col].iloc[0]:,.0f})")
+    
+    # ✅ KONVERSI KE RUPIAH hanya jika masih USD (satu perkalian untuk semua kolom currency)
+    if USD_TO_IDR > 1:
+        df[currency_cols] = df[currency_cols] * USD_TO_IDR
+    
+    for col in currency_cols:
+        if USD_TO_IDR > 1:
+            cleaned_sample = df[col].iloc[0] if len(df) > 0 else None
+            logger.info(f"   {col}: {original_samples[col]} → Rp {cleaned_sample:,.0f}")
+        else:
+            logger.info(f"   {col}: Already in IDR (Rp {df[col].iloc[0]:,.0f})")
     
     # ✅ FIX: persentase_gross_margin adalah PERSENTASE, bukan currency
     if 'persentase_gross_margin' in df.columns:
@@ -114,7 +187,11 @@ def transform_sales_data(df):
     
     df['tanggal'] = pd.to_datetime(df['tanggal'], format='%m/%d/%Y', errors='coerce')
     df['harga_satuan'] = pd.to_numeric(df['harga_satuan'], errors='coerce')
-    df['jumlah'] = pd.to_numeric(df['jumlah'], errors='coerce').astype('Int64')
+    # ✅ Parse + downcast integer dalam satu pass (int8/int16/... terkecil yang muat);
+    # jika ada nilai tidak valid hasilnya float64 NaN — baris itu dibuang di
+    # Rule 26-30 (jumlah > 0), jadi tidak perlu salinan nullable Int64.
+    # Kolom currency/rating tetap float64 agar presisi Rupiah tidak hilang
+    df['jumlah'] = pd.to_numeric(df['jumlah'], errors='coerce', downcast='integer')
     df['pajak_5_persen'] = pd.to_numeric(df['pajak_5_persen'], errors='coerce')
     df['total_penjualan_sebelum_pajak'] = pd.to_numeric(df['total_penjualan_sebelum_pajak'], errors='coerce')
     
@@ -123,7 +200,11 @@ def transform_sales_data(df):
     # ========================================
     logger.info("RULE 6-10: Handle Missing Values")
     
-    df['rating'] = df['rating'].fillna(df['rating'].median())
+    # ✅ Median dihitung sekali langsung di ndarray float64
+    rating_values = df['rating'].to_numpy(dtype=np.float64, na_value=np.nan)
+    valid_ratings = rating_values[~np.isnan(rating_values)]
+    rating_median = float(np.median(valid_ratings)) if valid_ratings.size else np.nan
+    df['rating'] = df['rating'].fillna(rating_median)
     df['jenis_kelamin'] = df['jenis_kelamin'].fillna('Unknown')
     df['tipe_customer'] = df['tipe_customer'].fillna('Normal')
     df = df.dropna(subset=['id_invoice', 'tanggal'])
@@ -135,10 +216,15 @@ def transform_sales_data(df):
     logger.info("RULE 11-15: Data Cleaning")
     
     df['id_invoice'] = df['id_invoice'].astype(str).str.strip()
-    df['cabang'] = df['cabang'].astype(str).str.strip().str.title()
-    df['kota'] = df['kota'].astype(str).str.strip().str.title()
-    df['metode_pembayaran'] = df['metode_pembayaran'].astype(str).str.strip().str.title()
-    df['kategori_produk'] = df['kategori_produk'].astype(str).str.strip()
+    
+    # ✅ Kolom low-cardinality: strip/title per kategori, bukan per baris
+    for col in ['cabang', 'kota', 'metode_pembayaran']:
+        df[col] = clean_text_categories(df[col], title=True)
+    df['kategori_produk'] = clean_text_categories(df['kategori_produk'])
+    
+    # ✅ Kolom low-cardinality → category, mapping berikutnya cukup per kategori
+    for col in LOW_CARDINALITY_COLS:
+        df[col] = df[col].astype('category')
     
     # ========================================
     # RULE 16-20: Standardization
@@ -150,27 +236,26 @@ def transform_sales_data(df):
         'M': 'Male', 'F': 'Female',
         'L': 'Male', 'P': 'Female'
     }
-    df['jenis_kelamin'] = df['jenis_kelamin'].map(gender_mapping).fillna('Unknown')
+    df['jenis_kelamin'] = map_categories(df['jenis_kelamin'], gender_mapping, default='Unknown')
     
     customer_type_mapping = {
         'Member': 'Member', 'Normal': 'Normal', 
         'VIP': 'VIP', 'Regular': 'Normal'
     }
-    df['tipe_customer'] = df['tipe_customer'].map(customer_type_mapping).fillna('Normal')
+    df['tipe_customer'] = map_categories(df['tipe_customer'], customer_type_mapping, default='Normal')
     
     payment_mapping = {
         'Cash': 'Cash', 'Credit Card': 'Credit card',
         'Ewallet': 'Ewallet', 'E-Wallet': 'Ewallet',
         'E-wallet': 'Ewallet', 'Debit Card': 'Debit card'
     }
-    df['metode_pembayaran'] = df['metode_pembayaran'].replace(payment_mapping)
+    df['metode_pembayaran'] = map_categories(df['metode_pembayaran'], payment_mapping)
     
     branch_code_mapping = {
         'Alex': 'ALEX', 'Giza': 'GIZA',
         'Cairo': 'CAIRO', 'Mandalay': 'MANDALAY'
     }
-    df['cabang'] = df['cabang'].replace(branch_code_mapping)
-    df['kota'] = df['kota'].str.title()
+    df['cabang'] = map_categories(df['cabang'], branch_code_mapping)
     
     # ========================================
     # RULE 21-25: Calculate Derived Fields
@@ -178,21 +263,32 @@ def transform_sales_data(df):
     logger.info("RULE 21-25: Calculate Derived Fields")
     
     df['total_penjualan'] = df['total_penjualan_sebelum_pajak'] + df['pajak_5_persen']
-    df['margin'] = df['persentase_gross_margin'] / 100 * df['total_penjualan_sebelum_pajak']
-    df['tahun'] = df['tanggal'].dt.year
-    df['bulan'] = df['tanggal'].dt.month
-    df['quarter'] = df['tanggal'].dt.quarter
+    # ✅ Aritmetika langsung di ndarray float64, hasil antara ditulis in-place
+    margin = df['persentase_gross_margin'].to_numpy(dtype=np.float64) / 100
+    margin *= df['total_penjualan_sebelum_pajak'].to_numpy(dtype=np.float64)
+    df['margin'] = margin
+    # ✅ tahun/bulan/quarter dari satu cast datetime64[M] (bulan sejak 1970-01);
+    # tanggal sudah bebas NaT sejak dropna di Rule 6-10
+    months_since_epoch = df['tanggal'].to_numpy().astype('datetime64[M]').astype(np.int64)
+    bulan = (months_since_epoch % 12 + 1).astype(np.int8)
+    df['tahun'] = (months_since_epoch // 12 + 1970).astype(np.int16)
+    df['bulan'] = bulan
+    df['quarter'] = ((bulan - 1) // 3 + 1).astype(np.int8)
     
     # ========================================
     # RULE 26-30: Validation & Quality Checks
     # ========================================
     logger.info("RULE 26-30: Validation & Quality Checks")
     
-    df = df[df['harga_satuan'] > 0]
-    df = df[df['jumlah'] > 0]
-    df = df[df['total_penjualan_sebelum_pajak'] > 0]
-    df = df[df['rating'] >= 0]
-    df = df[df['rating'] <= 10]
+    # ✅ Semua validasi digabung jadi satu mask; baris baru dibuang sekali
+    # di akhir Rule 36-40 (NA pada jumlah/Int64 dihitung False)
+    valid_mask = (
+        (df['harga_satuan'] > 0)
+        & (df['jumlah'] > 0)
+        & (df['total_penjualan_sebelum_pajak'] > 0)
+        & (df['rating'] >= 0)
+        & (df['rating'] <= 10)
+    ).fillna(False).to_numpy(dtype=bool)
     
     # ========================================
     # RULE 31-35: Business Logic
@@ -200,36 +296,58 @@ def transform_sales_data(df):
     logger.info("RULE 31-35: Business Logic & Categorization")
     
     # ✅ FIX: Update bins untuk nilai IDR (bukan USD)
-    df['sales_category'] = pd.cut(
+    df['sales_category'] = bin_categories(
         df['total_penjualan'], 
         bins=[0, 1_500_000, 7_500_000, 15_000_000, float('inf')],  # IDR ranges
         labels=['Low', 'Medium', 'High', 'Very High']
     )
     
-    df['customer_satisfaction'] = pd.cut(
+    df['customer_satisfaction'] = bin_categories(
         df['rating'],
         bins=[0, 5, 7, 9, 10],
         labels=['Poor', 'Fair', 'Good', 'Excellent'],
         include_lowest=True
     )
     
-    df['waktu'] = pd.to_datetime(df['waktu'], format='%H:%M:%S', errors='coerce').dt.time
-    df['revenue_per_unit'] = df['total_penjualan'] / df['jumlah']
-    df['tax_percentage'] = (df['pajak_5_persen'] / df['total_penjualan_sebelum_pajak'] * 100).round(2)
+    # ✅ waktu diparse vectorized, tanpa objek datetime.time per baris:
+    # string 'HH:MM:SS' yang valid dipertahankan (di-cast ::TIME saat load fact),
+    # yang tidak valid tetap NaT seperti .dt.time sebelumnya (→ 'NaT' di staging)
+    waktu_parsed = pd.to_datetime(df['waktu'], format='%H:%M:%S', errors='coerce')
+    df['waktu'] = df['waktu'].where(waktu_parsed.notna(), pd.NaT)
+    
+    # Baris dengan jumlah/total 0 belum dibuang (slice di Rule 36-40) → abaikan warning /0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        revenue_per_unit = (
+            df['total_penjualan'].to_numpy(dtype=np.float64)
+            / df['jumlah'].to_numpy(dtype=np.float64, na_value=np.nan)
+        )
+        tax_percentage = (
+            df['pajak_5_persen'].to_numpy(dtype=np.float64)
+            / df['total_penjualan_sebelum_pajak'].to_numpy(dtype=np.float64)
+        )
+        tax_percentage *= 100
+    df['revenue_per_unit'] = revenue_per_unit
+    df['tax_percentage'] = np.round(tax_percentage, 2, out=tax_percentage)
     
     # ========================================
     # RULE 36-40: Final Cleaning
     # ========================================
     logger.info("RULE 36-40: Final Cleaning & Outlier Removal")
     
-    df = df.drop_duplicates(subset=['id_invoice'], keep='first')
-    df = df.reset_index(drop=True)
+    # ✅ Duplikat id_invoice: simpan kemunculan pertama di antara baris valid
+    # (baris tidak valid jadi NaN agar tidak ikut dihitung)
+    keep_mask = valid_mask & ~df['id_invoice'].where(valid_mask).duplicated(keep='first').to_numpy()
     
-    # ✅ Outlier removal dengan IQR
-    Q1 = df['total_penjualan'].quantile(0.25)
-    Q3 = df['total_penjualan'].quantile(0.75)
+    # ✅ Outlier removal dengan IQR (dihitung dari baris valid & unik)
+    # Q1 & Q3 dalam satu np.percentile di ndarray (NaN dilewati seperti .quantile)
+    sales_values = df['total_penjualan'].to_numpy(dtype=np.float64, na_value=np.nan)[keep_mask]
+    sales_values = sales_values[~np.isnan(sales_values)]
+    Q1, Q3 = np.percentile(sales_values, [25, 75]) if sales_values.size else (np.nan, np.nan)
     IQR = Q3 - Q1
-    df = df[(df['total_penjualan'] >= Q1 - 1.5 * IQR) & (df['total_penjualan'] <= Q3 + 1.5 * IQR)]
+    keep_mask &= df['total_penjualan'].between(Q1 - 1.5 * IQR, Q3 + 1.5 * IQR).to_numpy()
+    
+    # ✅ Satu-satunya slice baris: validasi + dedup + outlier sekaligus
+    df = df.loc[keep_mask].reset_index(drop=True)
     
     df['transform_date'] = datetime.now()
     df['data_quality_score'] = 100.0
@@ -263,8 +381,8 @@ def get_transformation_summary(df_before, df_after):
         'rows_removed': len(df_before) - len(df_after),
         'retention_rate': (len(df_after) / len(df_before) * 100) if len(df_before) > 0 else 0,
         'new_columns': [col for col in df_after.columns if col not in df_before.columns],
-        'null_counts_before': df_before.isnull().sum().sum(),
-        'null_counts_after': df_after.isnull().sum().sum(),
+        'null_counts_before': int(df_before.isna().to_numpy().sum()),
+        'null_counts_after': int(df_after.isna().to_numpy().sum()),
         'total_revenue_idr': df_after['total_penjualan_sebelum_pajak'].sum(),
         'avg_transaction_idr': df_after['total_penjualan_sebelum_pajak'].mean()
     }
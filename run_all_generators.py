@@ -3,18 +3,24 @@ Run All Data Generators - Clean Output
 """
 import subprocess
 import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 def run_generator(generator_name):
-    """Run a single generator with clean output"""
-    print(f"\n{'='*60}")
-    print(f"🚀 Running: {generator_name}")
-    print('='*60)
-    
-    result = subprocess.run(
+    """Run a single generator (output ditampung agar tidak bercampur saat paralel)"""
+    return subprocess.run(
         [sys.executable, '-m', generator_name],
-        capture_output=False,  # Show output directly
+        capture_output=True,
         text=True
     )
+
+def print_generator_result(generator_name, result):
+    """Print output satu generator sebagai satu blok utuh"""
+    print(f"\n{'='*60}")
+    print(f"🚀 Output: {generator_name}")
+    print('='*60)
+    print(result.stdout, end='')
+    if result.stderr:
+        print(result.stderr, end='', file=sys.stderr)
     
     if result.returncode == 0:
         print(f"✅ {generator_name} completed successfully")
@@ -36,10 +42,16 @@ if __name__ == "__main__":
     print("🎯 STARTING ALL DATA GENERATORS")
     print("="*60)
     
-    results = []
-    for gen in generators:
-        success = run_generator(gen)
-        results.append((gen, success))
+    # ✅ Generator saling independen (tabel berbeda) → jalan paralel,
+    # output dicetak per generator begitu selesai
+    status_by_gen = {}
+    with ThreadPoolExecutor(max_workers=len(generators)) as executor:
+        futures = {executor.submit(run_generator, gen): gen for gen in generators}
+        for future in as_completed(futures):
+            gen = futures[future]
+            status_by_gen[gen] = print_generator_result(gen, future.result())
+    
+    results = [(gen, status_by_gen[gen]) for gen in generators]
     
     print("\n" + "="*60)
     print("📊 SUMMARY")
@@ -9,23 +9,24 @@ Run this script to execute complete ETL process:
 3. Load to Data Warehouse
 4. Export to Data Lake (Bronze, Silver, Gold layers)
 
-Usage: python run_etl.py
+Usage: python run_etl.py [--exact-verify] [--skip-lake]
 """
 
 import sys
+import argparse
 import logging
 from datetime import datetime
 import os
 import warnings
+from concurrent.futures import ThreadPoolExecutor
 
 # ✅ MATIKAN SQLALCHEMY LOGGING SEBELUM IMPORT APAPUN
+# (cukup di logger induk: sqlalchemy.engine/.pool/.dialects/.orm mewarisi level ini)
 logging.getLogger('sqlalchemy').setLevel(logging.ERROR)
-logging.getLogger('sqlalchemy.engine').setLevel(logging.ERROR)
-logging.getLogger('sqlalchemy.pool').setLevel(logging.ERROR)
-logging.getLogger('sqlalchemy.dialects').setLevel(logging.ERROR)
-logging.getLogger('sqlalchemy.orm').setLevel(logging.ERROR)
 warnings.filterwarnings('ignore')
 
+from utils.logger import setup_queue_logging
+
 # Setup logging directory
 log_dir = 'logs'
 os.makedirs(log_dir, exist_ok=True)
@@ -33,29 +34,83 @@ os.makedirs(log_dir, exist_ok=True)
 log_file = os.path.join(log_dir, f"etl_pipeline_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log")
 
 # ✅ CONFIGURE LOGGING WITH UTF-8 ENCODING & ERROR HANDLING
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+# (via queue: thread ETL hanya enqueue, tulis file/console di background thread)
+setup_queue_logging(
     handlers=[
         logging.FileHandler(log_file, encoding='utf-8', errors='replace'),
         logging.StreamHandler(sys.stdout)
-    ]
+    ],
+    level=logging.INFO,
+    fmt='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 
 logger = logging.getLogger(__name__)
 
-def print_separator(char="=", width=80):
+# ✅ Import modul ETL sekali di level modul, SETELAH logging dikonfigurasi
+# (modul extract memanggil logging.basicConfig saat di-import)
+from sqlalchemy import text
+
+from config.database_config import get_engine, test_connection, fetch_estimated_row_counts
+from etl.extract.extract_sales import extract_sales_data, load_to_staging_db as load_sales_staging
+from etl.extract.extract_hr import extract_hr_data, load_to_staging_db as load_hr_staging
+from etl.extract.extract_marketing import extract_marketing_data, load_to_staging_db as load_marketing_staging
+from etl.load.load_dimensions import load_all_dimensions
+from etl.load.load_facts import load_all_facts
+
+# Export Data Lake bersifat opsional
+try:
+    from etl.export_to_silver_layer import export_to_silver
+    from etl.export_to_gold_layer import export_to_gold
+    lake_import_error = None
+except ImportError as ie:
+    export_to_silver = export_to_gold = None
+    lake_import_error = ie
+
+# Tabel DW yang dicek di STEP 7 (verifikasi row count)
+VERIFY_TABLES = [
+    'fact_sales', 'fact_marketing_response', 'fact_employee_performance',
+    'dim_produk', 'dim_customer', 'dim_employee',
+    'dim_cabang', 'dim_payment', 'dim_tanggal'
+]
+
+# Garis pemisah log (lebar tetap 80 kolom, dibuat sekali)
+SEPARATOR_LINE = "=" * 80
+STEP_LINE = "-" * 80
+
+def print_separator():
     """Print separator line"""
-    logger.info(char * width)
+    logger.info(SEPARATOR_LINE)
 
 def print_step_header(step_num, title):
     """Print step header"""
     logger.info("")
     logger.info(f"STEP {step_num}: {title}")
-    logger.info("-" * 80)
+    logger.info(STEP_LINE)
+
+def count_files(directory, extension):
+    """Hitung file dengan ekstensi tertentu via os.scandir (tanpa glob/stat per file)"""
+    if not os.path.isdir(directory):
+        return 0
+    with os.scandir(directory) as entries:
+        return sum(1 for entry in entries if entry.name.endswith(extension) and entry.is_file())
 
-def run_etl_pipeline():
-    """Execute complete ETL pipeline"""
+def extract_and_stage(source_name, extract, load_staging):
+    """
+    Extract satu sumber data lalu load ke tabel staging-nya
+    Load staging dalam satu transaksi per sumber (1x commit, dibuka setelah CSV selesai dibaca)
+    """
+    logger.info(f"Extracting {source_name} Data...")
+    df = extract()
+    with get_engine().begin() as conn:
+        load_staging(df, conn=conn)
+
+def run_etl_pipeline(exact_verify=False, skip_lake=False):
+    """
+    Execute complete ETL pipeline
+    exact_verify=True → row count DW dengan COUNT(*) (full scan),
+    default pakai estimasi pg_class.reltuples
+    skip_lake=True → STEP 6 (export Data Lake) dilewati, hanya DW
+    """
     start_time = datetime.now()
     
     try:
@@ -68,28 +123,25 @@ def run_etl_pipeline():
         
         # STEP 1: Test Database Connection
         print_step_header(1, "Testing Database Connection")
-        from config.database_config import test_connection
         if not test_connection():
             raise Exception("Database connection failed!")
         
         # STEP 2: Extract Phase
         print_step_header(2, "EXTRACT PHASE")
         
-        from etl.extract.extract_sales import extract_sales_data, load_to_staging_db as load_sales_staging
-        from etl.extract.extract_hr import extract_hr_data, load_to_staging_db as load_hr_staging
-        from etl.extract.extract_marketing import extract_marketing_data, load_to_staging_db as load_marketing_staging
-        
-        logger.info("Extracting Sales Data...")
-        df_sales = extract_sales_data()
-        load_sales_staging(df_sales)
-        
-        logger.info("Extracting HR Data...")
-        df_hr = extract_hr_data()
-        load_hr_staging(df_hr)
-        
-        logger.info("Extracting Marketing Data...")
-        df_marketing = extract_marketing_data()
-        load_marketing_staging(df_marketing)
+        # ✅ Extract + staging per sumber berjalan paralel (file & tabel staging
+        # saling lepas, masing-masing worker memakai koneksi sendiri dari pool)
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            futures = [
+                executor.submit(extract_and_stage, source_name, extract, load_staging)
+                for source_name, extract, load_staging in (
+                    ("Sales", extract_sales_data, load_sales_staging),
+                    ("HR", extract_hr_data, load_hr_staging),
+                    ("Marketing", extract_marketing_data, load_marketing_staging),
+                )
+            ]
+            for future in futures:
+                future.result()
         
         logger.info("[OK] Extract phase completed!")
         
@@ -100,92 +152,94 @@ def run_etl_pipeline():
         
         # STEP 4: Load Dimensions
         print_step_header(4, "LOAD DIMENSIONS")
-        
-        from etl.load.load_dimensions import load_all_dimensions
         load_all_dimensions()
         
         # STEP 5: Load Facts
         print_step_header(5, "LOAD FACT TABLES")
-        
-        from etl.load.load_facts import load_all_facts
         load_all_facts()
         
         # ✅ STEP 6: Export to Data Lake (NEW)
         print_step_header(6, "EXPORT TO DATA LAKE")
         
-        try:
-            # 6.1: Bronze Layer (already done during extract)
-            logger.info("Bronze Layer: Raw files already in data/lake/raw/")
-            
-            # 6.2: Silver Layer (Processed/Cleaned data)
-            logger.info("Exporting to Silver Layer (Processed)...")
-            from etl.export_to_silver_layer import export_to_silver
-            export_to_silver()
-            logger.info("✅ Silver layer export completed")
-            
-            # 6.3: Gold Layer (Curated/Aggregated data)
-            logger.info("Exporting to Gold Layer (Curated)...")
-            from etl.export_to_gold_layer import export_to_gold
-            export_to_gold()
-            logger.info("✅ Gold layer export completed")
-            
-            logger.info("[OK] Data Lake export phase completed!")
-            
-        except ImportError as ie:
-            logger.warning(f"[SKIP] Data Lake export modules not found: {ie}")
+        if skip_lake:
+            logger.info("[SKIP] Data Lake export disabled (--skip-lake)")
+        elif lake_import_error is not None:
+            logger.warning(f"[SKIP] Data Lake export modules not found: {lake_import_error}")
             logger.warning("       This is optional. Continue with main pipeline.")
-        except Exception as e:
-            logger.warning(f"[WARN] Data Lake export failed: {e}")
-            logger.warning("       Main DW pipeline successful. Lake export is optional.")
+        else:
+            try:
+                # 6.1: Bronze Layer (already done during extract)
+                logger.info("Bronze Layer: Raw files already in data/lake/raw/")
+                
+                # 6.2: Silver Layer (Processed/Cleaned data, dari staging)
+                # 6.3: Gold Layer (Curated/Aggregated data, dari fact)
+                # ✅ Sumber & file output saling lepas → diexport paralel
+                logger.info("Exporting to Silver Layer (Processed) & Gold Layer (Curated)...")
+                with ThreadPoolExecutor(max_workers=2) as executor:
+                    silver_future = executor.submit(export_to_silver)
+                    gold_future = executor.submit(export_to_gold)
+                    
+                    silver_future.result()
+                    logger.info("✅ Silver layer export completed")
+                    gold_future.result()
+                    logger.info("✅ Gold layer export completed")
+                
+                logger.info("[OK] Data Lake export phase completed!")
+                
+            except Exception as e:
+                logger.warning(f"[WARN] Data Lake export failed: {e}")
+                logger.warning("       Main DW pipeline successful. Lake export is optional.")
         
         # STEP 7: Verification (UPDATED numbering)
         print_step_header(7, "DATA VERIFICATION")
         
-        from config.database_config import get_engine
-        from sqlalchemy import text
-        import pandas as pd
-        
         engine = get_engine()
         
-        verification_query = text("""
-        SELECT 
-            'fact_sales' as table_name, COUNT(*) as row_count FROM fact_sales
-        UNION ALL
-        SELECT 'fact_marketing_response', COUNT(*) FROM fact_marketing_response
-        UNION ALL
-        SELECT 'fact_employee_performance', COUNT(*) FROM fact_employee_performance
-        UNION ALL
-        SELECT 'dim_produk', COUNT(*) FROM dim_produk
-        UNION ALL
-        SELECT 'dim_customer', COUNT(*) FROM dim_customer
-        UNION ALL
-        SELECT 'dim_employee', COUNT(*) FROM dim_employee
-        UNION ALL
-        SELECT 'dim_cabang', COUNT(*) FROM dim_cabang
-        UNION ALL
-        SELECT 'dim_payment', COUNT(*) FROM dim_payment
-        UNION ALL
-        SELECT 'dim_tanggal', COUNT(*) FROM dim_tanggal
-        ORDER BY table_name;
-        """)
+        if exact_verify:
+            # COUNT(*) per tabel → exact, tapi full scan semua tabel
+            verification_query = text("""
+            SELECT 
+                'fact_sales' as table_name, COUNT(*) as row_count FROM fact_sales
+            UNION ALL
+            SELECT 'fact_marketing_response', COUNT(*) FROM fact_marketing_response
+            UNION ALL
+            SELECT 'fact_employee_performance', COUNT(*) FROM fact_employee_performance
+            UNION ALL
+            SELECT 'dim_produk', COUNT(*) FROM dim_produk
+            UNION ALL
+            SELECT 'dim_customer', COUNT(*) FROM dim_customer
+            UNION ALL
+            SELECT 'dim_employee', COUNT(*) FROM dim_employee
+            UNION ALL
+            SELECT 'dim_cabang', COUNT(*) FROM dim_cabang
+            UNION ALL
+            SELECT 'dim_payment', COUNT(*) FROM dim_payment
+            UNION ALL
+            SELECT 'dim_tanggal', COUNT(*) FROM dim_tanggal
+            ORDER BY table_name;
+            """)
         
+        # ✅ Hasil cuma 9 baris x 2 kolom → fetchall langsung, tanpa DataFrame
         with engine.connect() as conn:
-            df_verification = pd.read_sql(verification_query, conn)
+            if exact_verify:
+                verification_rows = conn.execute(verification_query).fetchall()
+            else:
+                # ✅ Estimasi dari statistik planner: semua tabel di atas sudah
+                # di-ANALYZE oleh verify_dimensions()/verify_facts() di STEP 4-5
+                verification_rows = fetch_estimated_row_counts(conn, VERIFY_TABLES)
         
-        logger.info("\nData Warehouse Row Counts:")
-        logger.info("\n" + df_verification.to_string(index=False))
+        count_mode = "exact" if exact_verify else "estimated from pg_class"
+        logger.info(f"\nData Warehouse Row Counts ({count_mode}):")
+        # ✅ Satu baris log key=value per tabel (grep/jq-able)
+        for table_name, row_count in verification_rows:
+            logger.info(f"  row_count table={table_name} count={'n/a' if row_count is None else row_count}")
         
         # ✅ Data Lake Verification (NEW)
         logger.info("\nData Lake Status:")
-        from pathlib import Path
         
-        bronze_files = list(Path('data/lake/raw').glob('*.csv'))
-        silver_files = list(Path('data/lake/processed').glob('*.parquet'))
-        gold_files = list(Path('data/lake/curated').glob('*.parquet'))
-        
-        logger.info(f"  Bronze Layer: {len(bronze_files)} files")
-        logger.info(f"  Silver Layer: {len(silver_files)} files")
-        logger.info(f"  Gold Layer: {len(gold_files)} files")
+        logger.info(f"  Bronze Layer: {count_files('data/lake/raw', '.csv')} files")
+        logger.info(f"  Silver Layer: {count_files('data/lake/processed', '.parquet')} files")
+        logger.info(f"  Gold Layer: {count_files('data/lake/curated', '.parquet')} files")
         
         # Calculate duration
         end_time = datetime.now()
@@ -203,21 +257,31 @@ def run_etl_pipeline():
         
         return True
         
-    except Exception as e:
+    except Exception:
         end_time = datetime.now()
         duration = (end_time - start_time).total_seconds()
         
         logger.error("")
         print_separator()
-        logger.error(f"[ERROR] ETL PIPELINE FAILED: {e}")
+        # ✅ logger.exception: pesan + traceback (exc_info) dalam satu record
+        logger.exception("[ERROR] ETL PIPELINE FAILED")
         print_separator()
-        import traceback
-        logger.error(traceback.format_exc())
         logger.error(f"Failed after: {duration:.2f} seconds")
         print_separator()
         
         return False
 
 if __name__ == "__main__":
-    success = run_etl_pipeline()
+    parser = argparse.ArgumentParser(description="Nourish Beauty DW - complete ETL pipeline")
+    parser.add_argument(
+        '--exact-verify', action='store_true',
+        help="verifikasi row count dengan COUNT(*) (full scan) alih-alih statistik pg_class"
+    )
+    parser.add_argument(
+        '--skip-lake', action='store_true',
+        help="lewati STEP 6 (export Data Lake Silver/Gold), hanya load Data Warehouse"
+    )
+    args = parser.parse_args()
+    
+    success = run_etl_pipeline(exact_verify=args.exact_verify, skip_lake=args.skip_lake)
     sys.exit(0 if success else 1)
@@ -6,6 +6,7 @@ Author: Raudatul Sholehah - 2310817220002
 import os
 import shutil
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 
 def setup_data_lake():
     """Create data lake folder structure and documentation"""
@@ -28,9 +29,12 @@ def setup_data_lake():
     raw_dest = Path('data/lake/raw')
     
     if raw_source.exists():
-        for csv_file in raw_source.glob('*.csv'):
-            shutil.copy2(csv_file, raw_dest)
-            print(f"✅ Copied: {csv_file.name}")
+        # ✅ Copy file paralel (I/O-bound); print tetap di main thread sesuai urutan
+        csv_files = list(raw_source.glob('*.csv'))
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            copies = executor.map(lambda csv_file: shutil.copy2(csv_file, raw_dest), csv_files)
+            for csv_file, _ in zip(csv_files, copies):
+                print(f"✅ Copied: {csv_file.name}")
     
     # 3. Create documentation
     print("\nGenerating Data Lake documentation...")
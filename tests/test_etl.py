@@ -0,0 +1,272 @@
+"""
+Unit Tests - Transform Sales
+Author: Raudatul Sholehah - 2310817220002
+
+Hasil transform_sales (helper vectorized & pipeline lengkap) dibandingkan
+dengan perilaku lama yang row-wise agar output staging tidak berubah.
+"""
+
+import sys
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from etl.transform.transform_sales import (
+    bin_categories,
+    clean_text_categories,
+    map_categories,
+    transform_sales_data,
+)
+
+
+GENDER_MAPPING = {
+    'Male': 'Male', 'Female': 'Female',
+    'M': 'Male', 'F': 'Female',
+    'L': 'Male', 'P': 'Female'
+}
+
+PAYMENT_MAPPING = {
+    'Cash': 'Cash', 'Credit Card': 'Credit card',
+    'Ewallet': 'Ewallet', 'E-Wallet': 'Ewallet',
+    'E-wallet': 'Ewallet', 'Debit Card': 'Debit card'
+}
+
+
+def assert_same_values(result, expected):
+    """Bandingkan nilai per baris (category vs object diabaikan, NaN == NaN)"""
+    pd.testing.assert_series_equal(
+        pd.Series(result).astype(object).reset_index(drop=True),
+        pd.Series(expected).astype(object).reset_index(drop=True),
+        check_names=False
+    )
+
+
+def make_sales_frame(rows):
+    """DataFrame mentah sales (format CSV sumber, nilai USD)"""
+    base = {
+        'cabang': 'Alex', 'kota': 'Yangon', 'tipe_customer': 'Member',
+        'jenis_kelamin': 'Female', 'kategori_produk': 'Skincare',
+        'jumlah': 1, 'tanggal': '1/5/2019', 'waktu': '13:08:00',
+        'metode_pembayaran': 'Ewallet', 'persentase_gross_margin': 4.76,
+        'rating': 8.0
+    }
+    records = []
+    for id_invoice, harga, overrides in rows:
+        record = dict(base, id_invoice=id_invoice, harga_satuan=harga)
+        record.update(overrides)
+        if 'total_penjualan_sebelum_pajak' not in overrides:
+            record['total_penjualan_sebelum_pajak'] = record['harga_satuan'] * float(record['jumlah'] or 0)
+        record['pajak_5_persen'] = record['total_penjualan_sebelum_pajak'] * 0.05
+        record['pendapatan_kotor'] = record['pajak_5_persen']
+        records.append(record)
+    return pd.DataFrame(records)
+
+
+# ========================================
+# map_categories
+# ========================================
+
+def test_map_categories_with_default_matches_map_fillna():
+    series = pd.Series(['M', 'P', 'zz', np.nan, 'Female', 'L', 'F', 'Male', 'M'])
+
+    result = map_categories(series, GENDER_MAPPING, default='Unknown')
+    expected = series.map(GENDER_MAPPING).fillna('Unknown')
+
+    assert_same_values(result, expected)
+
+
+def test_map_categories_without_default_matches_replace():
+    series = pd.Series(['E-wallet', 'Credit Card', 'Debit Card', np.nan, 'Cash', 'Ewallet', 'x'])
+
+    result = map_categories(series, PAYMENT_MAPPING)
+    expected = series.replace(PAYMENT_MAPPING)
+
+    assert_same_values(result, expected)
+
+
+def test_map_categories_merges_categories_mapped_to_same_value():
+    series = pd.Series(['Regular', 'Normal', 'VIP', 'Regular'])
+
+    result = map_categories(series, {'Regular': 'Normal'}, default=None)
+
+    assert list(result.cat.categories).count('Normal') == 1
+    assert result.tolist() == ['Normal', 'Normal', 'VIP', 'Normal']
+
+
+def test_map_categories_keeps_index():
+    series = pd.Series(['M', 'F'], index=[10, 20])
+
+    result = map_categories(series, GENDER_MAPPING, default='Unknown')
+
+    assert result.index.tolist() == [10, 20]
+
+
+# ========================================
+# clean_text_categories
+# ========================================
+
+@pytest.mark.parametrize('title', [False, True])
+def test_clean_text_categories_matches_str_strip(title):
+    series = pd.Series([' alex', 'GIZA', 'cairo ', ' kota baru ', np.nan, 'giza', ' Skincare '])
+
+    result = clean_text_categories(series, title=title)
+    expected = series.astype(str).str.strip()
+    if title:
+        expected = expected.str.title()
+
+    assert_same_values(result, expected)
+
+
+# ========================================
+# jumlah (parse + downcast satu pass)
+# ========================================
+
+def test_transform_jumlah_downcast_to_smallest_integer():
+    df = make_sales_frame([(f'INV-{i}', 100.0 + i, {'jumlah': 1 + i % 3}) for i in range(6)])
+
+    result = transform_sales_data(df)
+
+    assert result['jumlah'].dtype == np.int8
+    assert result['jumlah'].tolist() == [1, 2, 3, 1, 2, 3]
+
+
+def test_transform_jumlah_invalid_values_are_dropped():
+    df = make_sales_frame(
+        [(f'INV-{i}', 100.0 + i, {'jumlah': str(1 + i % 3)}) for i in range(6)]
+        + [
+            ('BAD-QTY', 103.0, {'jumlah': 'x', 'total_penjualan_sebelum_pajak': 103.0}),
+            ('NO-QTY', 104.0, {'jumlah': None, 'total_penjualan_sebelum_pajak': 104.0}),
+        ]
+    )
+
+    result = transform_sales_data(df)
+
+    assert 'BAD-QTY' not in result['id_invoice'].tolist()
+    assert 'NO-QTY' not in result['id_invoice'].tolist()
+    assert result['jumlah'].tolist() == [1, 2, 3, 1, 2, 3]
+
+
+# ========================================
+# bin_categories (batas bin)
+# ========================================
+
+SALES_BINS = [0, 1_500_000, 7_500_000, 15_000_000, float('inf')]
+SALES_LABELS = ['Low', 'Medium', 'High', 'Very High']
+
+RATING_BINS = [0, 5, 7, 9, 10]
+RATING_LABELS = ['Poor', 'Fair', 'Good', 'Excellent']
+
+
+def test_bin_categories_matches_pd_cut_on_edges():
+    values = pd.Series([
+        -1, 0, 0.01, 1_500_000, 1_500_000.01, 7_500_000,
+        15_000_000, 15_000_001, np.inf, np.nan
+    ])
+
+    result = bin_categories(values, bins=SALES_BINS, labels=SALES_LABELS)
+    expected = pd.cut(values, bins=SALES_BINS, labels=SALES_LABELS)
+
+    pd.testing.assert_series_equal(pd.Series(result), pd.Series(expected))
+
+
+def test_bin_categories_include_lowest_matches_pd_cut():
+    ratings = pd.Series([-0.1, 0, 0.5, 5, 5.1, 7, 9, 9.5, 10, 10.5, np.nan])
+
+    result = bin_categories(ratings, bins=RATING_BINS, labels=RATING_LABELS, include_lowest=True)
+    expected = pd.cut(ratings, bins=RATING_BINS, labels=RATING_LABELS, include_lowest=True)
+
+    pd.testing.assert_series_equal(pd.Series(result), pd.Series(expected))
+
+
+def test_bin_categories_lowest_edge_excluded_by_default():
+    result = bin_categories(pd.Series([0.0, 5.0]), bins=RATING_BINS, labels=RATING_LABELS)
+
+    assert pd.isna(result[0])
+    assert result[1] == 'Poor'
+
+
+def test_bin_categories_accepts_nullable_integers():
+    values = pd.Series([0, 5, 6, pd.NA], dtype='Int64')
+
+    result = bin_categories(values, bins=RATING_BINS, labels=RATING_LABELS, include_lowest=True)
+    expected = pd.cut(values.astype(float), bins=RATING_BINS, labels=RATING_LABELS, include_lowest=True)
+
+    pd.testing.assert_series_equal(pd.Series(result), pd.Series(expected))
+
+
+# ========================================
+# transform_sales_data: waktu
+# ========================================
+
+def test_transform_waktu_invalid_becomes_nat_valid_passes_through():
+    times = ['13:08:00', '25:00:00', 'bad', None, '00:00:00', '23:59:59']
+    df = make_sales_frame([(f'INV-{i}', 100.0 + i, {'waktu': t}) for i, t in enumerate(times)])
+
+    result = transform_sales_data(df)
+    waktu_by_id = dict(zip(result['id_invoice'], result['waktu']))
+
+    # String valid tidak diubah (tetap str, bukan datetime.time)
+    assert waktu_by_id['INV-0'] == '13:08:00'
+    assert waktu_by_id['INV-4'] == '00:00:00'
+    assert waktu_by_id['INV-5'] == '23:59:59'
+    # Tidak valid/kosong → NaT, seperti .dt.time sebelumnya ('NaT' di staging)
+    for id_invoice in ('INV-1', 'INV-2', 'INV-3'):
+        assert waktu_by_id[id_invoice] is pd.NaT
+    assert result['waktu'].astype(str).tolist().count('NaT') == 3
+    assert 'waktu_detik' not in result.columns
+
+
+# ========================================
+# transform_sales_data: dedup & outlier IQR
+# ========================================
+
+def test_transform_dedup_keeps_first_valid_occurrence():
+    df = make_sales_frame(
+        [(f'INV-{i}', 100.0 + i, {}) for i in range(10)]
+        + [
+            ('DUP-A', 105.0, {'jumlah': 0}),   # kemunculan pertama tidak valid
+            ('DUP-A', 106.0, {}),              # → yang ini yang disimpan
+            ('DUP-B', 107.0, {}),              # kemunculan pertama valid → disimpan
+            ('DUP-B', 108.0, {}),
+        ]
+    )
+
+    result = transform_sales_data(df)
+
+    assert result['id_invoice'].tolist().count('DUP-A') == 1
+    assert result['id_invoice'].tolist().count('DUP-B') == 1
+
+    harga_by_id = dict(zip(result['id_invoice'], result['harga_satuan']))
+    assert harga_by_id['DUP-A'] == pytest.approx(106.0 * 15000)
+    assert harga_by_id['DUP-B'] == pytest.approx(107.0 * 15000)
+
+
+def test_transform_iqr_filter_matches_quantile_reference():
+    df = make_sales_frame(
+        [(f'INV-{i}', 100.0 + i, {}) for i in range(12)]
+        + [
+            ('OUT-HIGH', 900.0, {}),
+            ('OUT-LOW', 1.0, {}),
+            ('BAD-RATING', 104.0, {'rating': 11.0}),
+        ]
+    )
+
+    result = transform_sales_data(df)
+
+    # Referensi perilaku lama: filter validasi → drop_duplicates → quantile
+    totals = df['total_penjualan_sebelum_pajak'] * 15000 * 1.05
+    valid = (df['rating'] <= 10) & ~df['id_invoice'].duplicated()
+    q1, q3 = totals[valid].quantile(0.25), totals[valid].quantile(0.75)
+    iqr = q3 - q1
+    expected_ids = df.loc[
+        valid & totals.between(q1 - 1.5 * iqr, q3 + 1.5 * iqr), 'id_invoice'
+    ].tolist()
+
+    assert result['id_invoice'].tolist() == expected_ids
+    assert 'OUT-HIGH' not in expected_ids
+    assert 'OUT-LOW' not in expected_ids
+    assert result.index.tolist() == list(range(len(result)))
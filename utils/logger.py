@@ -3,8 +3,11 @@ Logging Utility Module
 Provides centralized logging configuration for the ETL pipeline
 """
 
+import atexit
 import logging
+import logging.handlers
 import os
+import queue
 from datetime import datetime
 from pathlib import Path
 
@@ -60,6 +63,76 @@ def get_logger(name: str, log_level: int = logging.INFO) -> logging.Logger:
     return logger
 
 
+# QueueHandler/QueueListener aktif (disimpan agar bisa dilepas lagi)
+_queue_handler = None
+_queue_listener = None
+
+
+def setup_queue_logging(handlers, level=logging.INFO, fmt=None, datefmt=None):
+    """
+    Konfigurasi root logger agar hanya memasukkan record ke queue
+    (QueueHandler); handler sebenarnya (file/console) dijalankan oleh
+    thread background QueueListener
+    
+    Seperti logging.basicConfig: jika root logger sudah punya handler
+    (QueueHandler dari panggilan sebelumnya, basicConfig, atau aplikasi
+    host), tidak ada yang ditambahkan — handler baru ditutup dan listener
+    yang sudah ada dikembalikan, sehingga tidak ada log dobel
+    
+    Args:
+        handlers (list): Handler yang benar-benar menulis record
+        level (int): Level root logger (default: INFO)
+        fmt (str): Format string untuk semua handler
+        datefmt (str): Format tanggal untuk %(asctime)s
+    
+    Returns:
+        logging.handlers.QueueListener: Listener yang sudah jalan (di-stop
+        saat exit), atau None jika root logger sudah dikonfigurasi pihak lain
+    """
+    global _queue_handler, _queue_listener
+    
+    root_logger = logging.getLogger()
+    if root_logger.handlers:
+        for handler in handlers:
+            handler.close()
+        return _queue_listener
+    
+    formatter = logging.Formatter(fmt, datefmt=datefmt)
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    
+    log_queue = queue.Queue(-1)
+    _queue_listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _queue_handler = logging.handlers.QueueHandler(log_queue)
+    
+    root_logger.setLevel(level)
+    root_logger.addHandler(_queue_handler)
+    
+    # Flush sisa record di queue sebelum interpreter berhenti
+    _queue_listener.start()
+    atexit.register(stop_queue_logging)
+    
+    return _queue_listener
+
+
+def stop_queue_logging():
+    """
+    Flush & hentikan QueueListener, lepas QueueHandler dari root logger,
+    lalu tutup handler sebenarnya (aman dipanggil berulang kali)
+    """
+    global _queue_handler, _queue_listener
+    
+    if _queue_handler is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+        _queue_handler = None
+    
+    if _queue_listener is not None:
+        _queue_listener.stop()
+        for handler in _queue_listener.handlers:
+            handler.close()
+        _queue_listener = None
+
+
 def setup_root_logger():
     """
     Setup root logger for the entire application
@@ -72,14 +145,14 @@ def setup_root_logger():
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     log_file = log_dir / f"etl_pipeline_{timestamp}.log"
     
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S',
+    return setup_queue_logging(
         handlers=[
             logging.FileHandler(log_file, encoding='utf-8'),
             logging.StreamHandler()
-        ]
+        ],
+        level=logging.INFO,
+        fmt='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
     )
 
 